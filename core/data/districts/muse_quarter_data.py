@@ -21,10 +21,7 @@ muse_cafe = Location(
     logical_height=len(cafe_layout),
     tile_map=cafe_layout # <-- Passa la pianta
 )
-muse_cafe.objects = {
-    # ... (gli altri oggetti)
-    cafe_toilet.object_id: cafe_toilet, # <-- Aggiungi il WC agli oggetti del caffè
-}
+muse_cafe.add_object(cafe_toilet) # <-- Aggiungi il WC agli oggetti del caffè
 
 # --- Pianta e Oggetti per "Museo d'Arte di Anthalys" ---
 museum_layout = [
@@ -50,16 +50,17 @@ loc_dosinvelos = Location(
     tile_map=dosinvelos_layout # <-- La mappa ora è un parametro
 )
 
-# 2. Assegna la pianta all'attributo .tile_map dopo la creazione
-loc_dosinvelos.objects = {
-    dosinvelos_fridge.object_id: dosinvelos_fridge,
-    dosinvelos_bed_erika.object_id: dosinvelos_bed_erika,
-    dosinvelos_bed_max.object_id: dosinvelos_bed_max,
-    dosinvelos_computer.object_id: dosinvelos_computer,
-    dosinvelos_bookshelf.object_id: dosinvelos_bookshelf,
-    dosinvelos_toilet.object_id: dosinvelos_toilet,
-    dosinvelos_sink.object_id: dosinvelos_sink,
-}
+# 2. Aggiunge gli oggetti tramite add_object, così l'indice per tipo resta aggiornato
+for dosinvelos_obj in (
+    dosinvelos_fridge,
+    dosinvelos_bed_erika,
+    dosinvelos_bed_max,
+    dosinvelos_computer,
+    dosinvelos_bookshelf,
+    dosinvelos_toilet,
+    dosinvelos_sink,
+):
+    loc_dosinvelos.add_object(dosinvelos_obj)
 
 
 # --- LISTA DI ESPORTAZIONE ---
@@ -1,5 +1,5 @@
 # core/modules/actions/fun_actions.py
-from typing import Dict, Optional, TYPE_CHECKING, Set as TypingSet, Tuple
+from typing import Dict, FrozenSet, Optional, TYPE_CHECKING, Tuple
 
 from core.modules.memory.memory_definitions import Problem
 
@@ -15,11 +15,22 @@ from core.config import time_config, actions_config, npc_config
 from core import settings
 from .action_base import BaseAction
 
-ACTIVITIES_WITHOUT_OBJECTS: TypingSet[FunActivityType] = {
+# DEBUG_MODE non cambia a runtime: letto una volta sola invece che a ogni tick.
+_DEBUG: bool = settings.DEBUG_MODE
+
+ACTIVITIES_WITHOUT_OBJECTS: FrozenSet[FunActivityType] = frozenset({
     FunActivityType.DANCE, FunActivityType.DAYDREAM, FunActivityType.JOG_IN_PLACE,
     FunActivityType.SING, FunActivityType.PRACTICE_PUBLIC_SPEAKING,
     FunActivityType.BROWSE_SOCIAL_MEDIA, FunActivityType.WATCH_CLOUDS,
     FunActivityType.MEDITATE, FunActivityType.PEOPLE_WATCH, FunActivityType.EXPLORE_NEIGHBORHOOD,
+})
+
+# Effetti extra sui bisogni per ogni attività, letti una sola volta dalla configurazione
+# invece che a ogni creazione di HaveFunAction.
+_PRECOMPUTED_EFFECTS: Dict[FunActivityType, Dict[NeedType, float]] = {
+    activity: dict(config["effects_on_needs"])
+    for activity, config in actions_config.HAVEFUN_ACTIVITY_CONFIGS.items()
+    if config.get("effects_on_needs")
 }
 
 class HaveFunAction(BaseAction):
@@ -60,13 +71,17 @@ class HaveFunAction(BaseAction):
         self.skill_xp_gain: float = skill_xp_gain
         self.required_object_types: Optional[Tuple[ObjectType, ...]] = required_object_types
         
-        self.effects_on_needs: Dict[NeedType, float] = { NeedType.FUN: self.fun_gain }
-        config = actions_config.HAVEFUN_ACTIVITY_CONFIGS.get(activity_type, {})
-        other_effects = config.get("effects_on_needs")
-        if other_effects:
-            self.effects_on_needs.update(other_effects)
+        other_effects = _PRECOMPUTED_EFFECTS.get(activity_type)
+        self.effects_on_needs: Dict[NeedType, float] = (
+            { NeedType.FUN: self.fun_gain, **other_effects } if other_effects else { NeedType.FUN: self.fun_gain }
+        )
 
-        if settings.DEBUG_MODE and self.activity_type:
+        # Intervallo (in tick) tra i log di avanzamento, fisso per tutta la durata dell'azione
+        self._log_interval: int = max(1, self.duration_ticks // 4 if self.duration_ticks > 0 else 1)
+        # Inverso della durata, usato per il guadagno parziale in caso di interruzione
+        self._inv_duration: float = 1.0 / self.duration_ticks if self.duration_ticks > 0 else 0.0
+
+        if _DEBUG and self.activity_type:
             skill_info = f", Skill: {self.skill_to_practice.name} +{self.skill_xp_gain}xp" if self.skill_to_practice else ""
             print(f"    [{self.action_type_name} INIT - {self.npc.name}] Creata per '{self.activity_type.name}'. "
                 f"Durata: {self.duration_ticks}t, Gain FUN: {self.fun_gain:.1f}{skill_info}")
@@ -86,16 +101,17 @@ class HaveFunAction(BaseAction):
         if not current_location: return False
 
         if not self.required_object_types:
-            if settings.DEBUG_MODE: print(f"    [{self.action_type_name} VALIDATE - {self.npc.name}] Attività '{self.activity_type.name}' necessita di un oggetto, ma 'required_object_types' non è configurato.")
+            if _DEBUG: print(f"    [{self.action_type_name} VALIDATE - {self.npc.name}] Attività '{self.activity_type.name}' necessita di un oggetto, ma 'required_object_types' non è configurato.")
             return False
 
-        for game_obj in current_location.get_objects():
-            if game_obj.is_available() and game_obj.object_type in self.required_object_types:
-                self.target_object = game_obj
-                return True
+        for object_type in self.required_object_types:
+            for game_obj in current_location.objects_by_type.get(object_type, ()):
+                if game_obj.is_available():
+                    self.target_object = game_obj
+                    return True
         
-        activity_name = self.activity_type.name if self.activity_type else "sconosciuta"
-        if settings.DEBUG_MODE:
+        if _DEBUG:
+            activity_name = self.activity_type.name if self.activity_type else "sconosciuta"
             print(f"    [{self.action_type_name} VALIDATE - {self.npc.name}] Nessun oggetto disponibile trovato per '{activity_name}' in {current_location.name}.")
         return False
 
@@ -104,40 +120,34 @@ class HaveFunAction(BaseAction):
         if self.target_object:
             self.target_object.set_in_use(self.npc.npc_id)
 
-        if settings.DEBUG_MODE:
+        if _DEBUG:
             # 1. Assegniamo le variabili a dei nomi locali per aiutare Pylance
             activity = self.activity_type
             owner_npc = self.npc
 
             # 2. Aggiungiamo un controllo di sicurezza che forza Pylance a riconoscere i tipi
             if activity and owner_npc:
-                
-                # 3. Otteniamo il genere
-                owner_gender = owner_npc.gender
-
-                # 4. Ora chiamiamo il metodo.
-                activity_name = getattr(activity, 'display_name_it')(owner_gender)
-                
+                # 3. Il nome localizzato (in base al genere) viene calcolato solo dentro il print
                 target_info = f" usando '{self.target_object.name}'" if self.target_object else ""
-                print(f"    [{self.action_type_name} START - {owner_npc.name}] Inizia a: {activity_name}{target_info}.")
+                print(f"    [{self.action_type_name} START - {owner_npc.name}] Inizia a: "
+                      f"{getattr(activity, 'display_name_it')(owner_npc.gender)}{target_info}.")
 
     def execute_tick(self):
         super().execute_tick()
-        if self.is_started and settings.DEBUG_MODE and self.activity_type:
-            log_interval = max(1, self.duration_ticks // 4 if self.duration_ticks > 0 else 1)
-            if self.elapsed_ticks > 0 and self.elapsed_ticks % log_interval == 0 and not self.is_finished:
+        if _DEBUG and self.is_started and self.activity_type:
+            if self.elapsed_ticks > 0 and self.elapsed_ticks % self._log_interval == 0 and not self.is_finished:
                 print(f"    [{self.action_type_name} PROGRESS - {self.npc.name}] Si sta divertendo ({self.activity_type.name})... ({self.get_progress_percentage():.0%})")
 
     def on_finish(self):
         if self.npc and self.effects_on_needs:
+            # effects_on_needs contiene già NeedType.FUN: il guadagno di divertimento viene applicato una sola volta
             for need_type, change_amount in self.effects_on_needs.items():
-                self.npc.change_need_value(need_type, change_amount)
+                self.npc.change_need_value(need_type, change_amount, is_decay_event=False)
         if self.npc and self.activity_type:
-            if settings.DEBUG_MODE:
+            if _DEBUG:
                 print(f"    [{self.action_type_name} FINISH - {self.npc.name}] Finito di: {self.activity_type.name}. Applico effetti completi.")
-            self.npc.change_need_value(NeedType.FUN, self.fun_gain, is_decay_event=False)
             if self.skill_to_practice and self.skill_xp_gain > 0:
-                if settings.DEBUG_MODE:
+                if _DEBUG:
                     print(f"        -> Guadagno Skill: {self.skill_xp_gain:.1f} XP in {self.skill_to_practice.name}")
 
             # Recupera il money_gain dalla configurazione dell'attività
@@ -148,7 +158,7 @@ class HaveFunAction(BaseAction):
         # 
         # if money_gain > 0:
         #     self.npc.money += money_gain
-        #     if settings.DEBUG_MODE:
+        #     if _DEBUG:
         #         print(f"        -> Guadagno Economico: +{money_gain:.2f} Athel")
         # --- FINE BLOCCO COMMENTATO ---
 
@@ -160,10 +170,10 @@ class HaveFunAction(BaseAction):
         super().on_interrupt_effects()
         
         if self.npc and self.duration_ticks > 0 and self.activity_type:
-            proportion_completed = self.elapsed_ticks / self.duration_ticks
+            proportion_completed = self.elapsed_ticks * self._inv_duration
             partial_fun_gain = self.fun_gain * proportion_completed * 0.75 
             if partial_fun_gain > 0:
-                if settings.DEBUG_MODE:
+                if _DEBUG:
                     print(f"    [{self.action_type_name} CANCEL - {self.npc.name}] Attività {self.activity_type.name} interrotta. "
                         f"Applicato guadagno FUN parziale: {partial_fun_gain:.2f}")
                 self.npc.change_need_value(NeedType.FUN, partial_fun_gain, is_decay_event=False)
@@ -0,0 +1,92 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""Compiled Hannay19 ESRI sweep used by `esri` when numba is not installed.
+
+Build in place with `cythonize -i _hannay19.pyx`. Add `-fopenmp` to the compiler and linker flags to run the sweep in parallel."""
+
+import numpy as np
+from cython.parallel import prange
+from libc.math cimport cos, sin, pow, floor, M_PI
+
+cdef struct _State:
+    double R
+    double Psi
+    double n
+
+cdef inline _State _hannay19_derv(_State y, double light, const double *params) noexcept nogil:
+    "Right-hand-side of `Hannay19.derv`. `params` is ordered as `metrics._HANNAY19_PARAMETER_NAMES`"
+    cdef double tau = params[0], K = params[1], gamma = params[2], Beta1 = params[3]
+    cdef double A1 = params[4], A2 = params[5], BetaL1 = params[6], BetaL2 = params[7]
+    cdef double sigma = params[8], G = params[9], alpha_0 = params[10], delta = params[11]
+    cdef double p = params[12], I0 = params[13]
+    cdef double R = y.R, Psi = y.Psi, n = y.n
+    cdef _State dydt
+
+    cdef double alpha = alpha_0 * pow(light, p) / (pow(light, p) + I0)
+
+    cdef double Bhat = G * (1.0 - n) * alpha
+    cdef double A1_term_amp = A1 * 0.5 * Bhat * (1.0 - pow(R, 4.0)) * cos(Psi + BetaL1)
+    cdef double A2_term_amp = A2 * 0.5 * Bhat * R * (1.0 - pow(R, 8.0)) * cos(2.0 * Psi + BetaL2)
+    cdef double LightAmp = A1_term_amp + A2_term_amp
+    cdef double A1_term_phase = A1 * Bhat * 0.5 * (pow(R, 3.0) + 1.0 / R) * sin(Psi + BetaL1)
+    cdef double A2_term_phase = A2 * Bhat * 0.5 * (1.0 + pow(R, 8.0)) * sin(2.0 * Psi + BetaL2)
+    cdef double LightPhase = sigma * Bhat - A1_term_phase - A2_term_phase
+
+    dydt.R = -1.0 * gamma * R + K * cos(Beta1) / 2.0 * R * (1.0 - pow(R, 4.0)) + LightAmp
+    dydt.Psi = 2*M_PI/tau + K / 2.0 * sin(Beta1) * (1 + pow(R, 4.0)) + LightPhase
+    dydt.n = 60.0 * (alpha * (1.0 - n) - delta * n)
+    return dydt
+
+cdef inline _State _offset(_State y, _State k, double h) noexcept nogil:
+    cdef _State out
+    out.R = y.R + k.R * h
+    out.Psi = y.Psi + k.Psi * h
+    out.n = y.n + k.n * h
+    return out
+
+cdef inline _State _hannay19_step_rk4(_State y, double light, double dt, const double *params) noexcept nogil:
+    "Same fourth-order Runge-Kutta step as `CircadianModel.step_rk4`"
+    cdef _State k1 = _hannay19_derv(y, light, params)
+    cdef _State k2 = _hannay19_derv(_offset(y, k1, dt / 2.0), light, params)
+    cdef _State k3 = _hannay19_derv(_offset(y, k2, dt / 2.0), light, params)
+    cdef _State k4 = _hannay19_derv(_offset(y, k3, dt), light, params)
+    y.R = y.R + (dt / 6.0) * (k1.R + 2.0*k2.R + 2.0*k3.R + k4.R)
+    y.Psi = y.Psi + (dt / 6.0) * (k1.Psi + 2.0*k2.Psi + 2.0*k3.Psi + k4.Psi)
+    y.n = y.n + (dt / 6.0) * (k1.n + 2.0*k2.n + 2.0*k3.n + k4.n)
+    return y
+
+def esri_sweep(const double[::1] esri_time, # start time of each ESRI simulation
+               const long long[::1] start_idx, # index of `light` at (or right before) each start time
+               const double[::1] weights, # interpolation weight between `light[start_idx]` and the next sample
+               const float[::1] light, # light schedule sampled every `dt` hours, as float32
+               double dt, # simulation step size in hours
+               const long long[::1] num_steps, # number of timepoints of each simulation
+               double initial_amplitude, # initial amplitude for every simulation
+               double phase_at_midnight, # phase at midnight
+               const double[::1] params, # Hannay19 parameters ordered as `metrics._HANNAY19_PARAMETER_NAMES`
+               ):
+    "Integrate one Hannay19 trajectory per ESRI timepoint, keeping only the final amplitude. Mirrors `metrics._esri_kernel`"
+    cdef Py_ssize_t n_out = esri_time.shape[0]
+    cdef Py_ssize_t last = light.shape[0] - 1
+    cdef const double *p = &params[0]
+    result = np.empty(n_out)
+    cdef double[::1] esri_array = result
+    cdef Py_ssize_t idx, k, j, j1
+    cdef double t, w, light_value
+    cdef _State y
+    for idx in prange(n_out, nogil=True):
+        t = esri_time[idx]
+        y.R = initial_amplitude
+        y.Psi = phase_at_midnight + (t - 24.0 * floor(t / 24.0)) * M_PI / 12
+        y.n = 0.0
+        w = weights[idx]
+        for k in range(1, num_steps[idx]):
+            j = start_idx[idx] + k
+            if j > last:
+                j = last
+            j1 = j + 1
+            if j1 > last:
+                j1 = last
+            light_value = (1.0 - w) * light[j] + w * light[j1]
+            y = _hannay19_step_rk4(y, light_value, dt, p)
+        esri_array[idx] = y.R
+    return result
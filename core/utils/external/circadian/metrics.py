@@ -9,10 +9,89 @@ __all__ = ['esri']
 import warnings
 import numpy as np
 from typing import List
-from .models import Hannay19
+from .models import Hannay19, _light_input_checking
 from .lights import LightSchedule
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    # keep the kernels below importable (and runnable as plain Python) without numba
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
+try:
+    from ._hannay19 import esri_sweep # optional compiled fallback, see _hannay19.pyx
+    HANNAY19_EXTENSION_AVAILABLE = True
+except ImportError:
+    HANNAY19_EXTENSION_AVAILABLE = False
 
 # %% ../nbs/api/04_metrics.ipynb 5
+_HANNAY19_PARAMETER_NAMES = ('tau', 'K', 'gamma', 'Beta1', 'A1', 'A2', 'BetaL1', 'BetaL2',
+                             'sigma', 'G', 'alpha_0', 'delta', 'p', 'I0')
+
+@njit(cache=True, error_model='numpy')
+def _hannay19_derv(R, Psi, n, light, params):
+    "Scalar right-hand-side of `Hannay19.derv`. `params` is ordered as `_HANNAY19_PARAMETER_NAMES`"
+    tau, K, gamma, Beta1 = params[0], params[1], params[2], params[3]
+    A1, A2, BetaL1, BetaL2 = params[4], params[5], params[6], params[7]
+    sigma, G, alpha_0, delta = params[8], params[9], params[10], params[11]
+    p, I0 = params[12], params[13]
+
+    alpha = alpha_0 * pow(light, p) / (pow(light, p) + I0)
+
+    Bhat = G * (1.0 - n) * alpha
+    A1_term_amp = A1 * 0.5 * Bhat * (1.0 - pow(R, 4.0)) * np.cos(Psi + BetaL1)
+    A2_term_amp = A2 * 0.5 * Bhat * R * (1.0 - pow(R, 8.0)) * np.cos(2.0 * Psi + BetaL2)
+    LightAmp = A1_term_amp + A2_term_amp
+    A1_term_phase = A1 * Bhat * 0.5 * (pow(R, 3.0) + 1.0 / R) * np.sin(Psi + BetaL1)
+    A2_term_phase = A2 * Bhat * 0.5 * (1.0 + pow(R, 8.0)) * np.sin(2.0 * Psi + BetaL2)
+    LightPhase = sigma * Bhat - A1_term_phase - A2_term_phase
+
+    dR = -1.0 * gamma * R + K * np.cos(Beta1) / 2.0 * R * (1.0 - pow(R, 4.0)) + LightAmp
+    dPsi = 2*np.pi/tau + K / 2.0 * np.sin(Beta1) * (1 + pow(R, 4.0)) + LightPhase
+    dn = 60.0 * (alpha * (1.0 - n) - delta * n)
+    return dR, dPsi, dn
+
+@njit(cache=True, error_model='numpy')
+def _hannay19_step_rk4(R, Psi, n, light, dt, params):
+    "Scalar version of `CircadianModel.step_rk4` for `Hannay19`"
+    k1R, k1P, k1n = _hannay19_derv(R, Psi, n, light, params)
+    k2R, k2P, k2n = _hannay19_derv(R + k1R * dt / 2.0, Psi + k1P * dt / 2.0, n + k1n * dt / 2.0, light, params)
+    k3R, k3P, k3n = _hannay19_derv(R + k2R * dt / 2.0, Psi + k2P * dt / 2.0, n + k2n * dt / 2.0, light, params)
+    k4R, k4P, k4n = _hannay19_derv(R + k3R * dt, Psi + k3P * dt, n + k3n * dt, light, params)
+    R = R + (dt / 6.0) * (k1R + 2.0*k2R + 2.0*k3R + k4R)
+    Psi = Psi + (dt / 6.0) * (k1P + 2.0*k2P + 2.0*k3P + k4P)
+    n = n + (dt / 6.0) * (k1n + 2.0*k2n + 2.0*k3n + k4n)
+    return R, Psi, n
+
+@njit(parallel=True, cache=True, error_model='numpy')
+def _esri_kernel(esri_time, # start time of each ESRI simulation
+                 start_idx, # index of `light` at (or right before) each start time
+                 weights, # interpolation weight between `light[start_idx]` and the next sample
+                 light, # light schedule sampled every `dt` hours, as float32
+                 dt, # simulation step size in hours
+                 num_steps, # number of timepoints of each simulation
+                 initial_amplitude, # initial amplitude for every simulation
+                 phase_at_midnight, # phase at midnight
+                 params, # Hannay19 parameters ordered as `_HANNAY19_PARAMETER_NAMES`
+                 ):
+    "Integrate one Hannay19 trajectory per ESRI timepoint in parallel, keeping only the final amplitude"
+    esri_array = np.empty(esri_time.shape[0])
+    last = light.shape[0] - 1
+    for idx in prange(esri_time.shape[0]):
+        R = initial_amplitude
+        Psi = phase_at_midnight + np.mod(esri_time[idx], 24.0) * np.pi / 12
+        n = 0.0
+        w = weights[idx]
+        for k in range(1, num_steps[idx]):
+            j = min(start_idx[idx] + k, last)
+            light_value = (1.0 - w) * light[j] + w * light[min(j + 1, last)]
+            R, Psi, n = _hannay19_step_rk4(R, Psi, n, light_value, dt, params)
+        esri_array[idx] = R
+    return esri_array
+
+# %% ../nbs/api/04_metrics.ipynb 6
 def esri(time: np.ndarray, # time in hours to use for the simulation 
          light_schedule: np.ndarray, # light schedule in lux 
          analysis_days: int=4, # number of days used to calculate ESRI
@@ -28,7 +107,11 @@ def esri(time: np.ndarray, # time in hours to use for the simulation
             raise TypeError(f'light_schedule must be a numpy array, not {type(light_schedule)}')
         if len(time) != len(light_schedule):
             raise ValueError(f'time and light_schedule must be the same length')
-        if not np.all(np.isclose(np.diff(time), np.diff(time)[0])):
+        time_steps = np.diff(time)
+        simulation_dt = time_steps[0]
+        # same tolerance as np.isclose(time_steps, simulation_dt), without building a boolean array.
+        # written as `not <=` so that NaNs in `time` fail the check, as they did with np.isclose
+        if not max(time_steps.max() - simulation_dt, simulation_dt - time_steps.min()) <= 1e-8 + 1e-5 * abs(simulation_dt):
             raise ValueError(f'time must have a fixed time resolution (time between timepoints must be constant)')
         if not isinstance(analysis_days, int):
             raise TypeError(f'analysis_days must be an integer, not {type(analysis_days)}')
@@ -44,17 +127,43 @@ def esri(time: np.ndarray, # time in hours to use for the simulation
             raise ValueError(f'initial_amplitude must be non-negative')
         # calculate ESRI 
         model = Hannay19(params={'K': 0.0, 'gamma': 0.0}) # with these parameters, amplitude is constant in the absence of light
-        simulation_dt = np.diff(time)[0]
         esri_time = np.arange(time[0], time[-1] - analysis_days*24, esri_dt)
-        esri_array = np.zeros_like(esri_time)
-        for idx, t in enumerate(esri_time):
-            initial_phase = phase_at_midnight + np.mod(t, 24.0) * np.pi / 12 # assumes regular schedule with wake at 8 am
-            initial_condition = np.array([initial_amplitude, initial_phase, 0.0])
-            simulation_time = np.arange(t, t + analysis_days*24, simulation_dt)
-            simulation_light = np.interp(simulation_time, time, light_schedule)
-            trajectory = model(simulation_time, initial_condition, simulation_light)
-            esri_value = trajectory.states[-1, 0] # model amplitude at the end of the simulation
-            esri_array[idx] = esri_value
+        # same length as np.arange(t, t + analysis_days*24, simulation_dt) for each start time t, which can differ by one step
+        num_steps = np.ceil(((esri_time + analysis_days*24) - esri_time) / simulation_dt).astype(np.int64)
+        max_steps = num_steps.max() if len(num_steps) > 0 else 0
+        simulation_offsets = np.arange(max_steps) * simulation_dt # shared by every simulation
+        # `time` is a uniform grid, so interpolating onto t + k*dt reduces to a fixed offset and weight per start time
+        positions = (esri_time - time[0]) / simulation_dt
+        start_idx = np.floor(positions + 1e-9).astype(np.int64)
+        weights = np.clip(positions - start_idx, 0.0, 1.0)
+        weights[weights < 1e-9] = 0.0
+        if NUMBA_AVAILABLE or HANNAY19_EXTENSION_AVAILABLE:
+            _light_input_checking(light_schedule)
+            params = np.array([getattr(model, name) for name in _HANNAY19_PARAMETER_NAMES], dtype=np.float64)
+            # lux values do not need double precision; a contiguous float32 copy halves what the kernel streams from memory
+            sweep = _esri_kernel if NUMBA_AVAILABLE else esri_sweep
+            esri_array = sweep(esri_time, start_idx, weights,
+                               np.ascontiguousarray(light_schedule, dtype=np.float32),
+                               float(simulation_dt), num_steps, float(initial_amplitude),
+                               float(phase_at_midnight), params)
+        else:
+            esri_array = np.zeros_like(esri_time)
+            # repeat the last light value past the end of the schedule (as np.interp does) so every slice is in bounds
+            padding = max(0, (start_idx.max() if len(start_idx) > 0 else 0) + max_steps + 1 - len(light_schedule))
+            padded_light = np.concatenate([light_schedule, np.full(padding, light_schedule[-1])])
+            # only the initial phase changes between simulations. The model copies the initial condition, so it can be reused
+            initial_condition = np.array([initial_amplitude, 0.0, 0.0])
+            for idx, t in enumerate(esri_time):
+                initial_condition[1] = phase_at_midnight + np.mod(t, 24.0) * np.pi / 12 # assumes regular schedule with wake at 8 am
+                steps = num_steps[idx]
+                simulation_time = t + simulation_offsets[:steps]
+                first = start_idx[idx]
+                simulation_light = padded_light[first:first + steps]
+                if weights[idx] > 0.0:
+                    simulation_light = (1.0 - weights[idx]) * simulation_light + weights[idx] * padded_light[first + 1:first + steps + 1]
+                trajectory = model(simulation_time, initial_condition, simulation_light)
+                esri_value = trajectory.states[-1, 0] # model amplitude at the end of the simulation
+                esri_array[idx] = esri_value
         # clean up any negative values
         esri_array[esri_array < 0] = np.nan
         # if there's any NaNs, throw a warning thay probably dt was too small
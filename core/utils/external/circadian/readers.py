@@ -11,9 +11,15 @@ import json
 import numpy as np
 import pandas as pd
 from typing import Dict
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # %% ../nbs/api/05_readers.ipynb 6
 VALID_WEARABLE_STREAMS = ['steps', 'heartrate', 'wake', 'light_estimate', 'activity']
+_VALID_WEARABLE_STREAMS_SET = frozenset(VALID_WEARABLE_STREAMS)
 
 # %% ../nbs/api/05_readers.ipynb 7
 @pd.api.extensions.register_dataframe_accessor("wearable")
@@ -29,7 +35,7 @@ class WearableData:
             if 'start' not in obj.columns and 'end' not in obj.columns:
                 raise AttributeError("DataFrame must have 'datetime' column or 'start' and 'end' columns")
 
-        if not any([col in obj.columns for col in VALID_WEARABLE_STREAMS]):
+        if _VALID_WEARABLE_STREAMS_SET.isdisjoint(obj.columns):
             raise AttributeError(f"DataFrame must have at least one wearable data column from: {VALID_WEARABLE_STREAMS}.")
         
     @staticmethod
@@ -85,24 +91,48 @@ def load_json(filepath: str, # path to file
     if metadata is not None:
         WearableData._validate_metadata(metadata)
     # load json
-    jdict = json.load(open(filepath, 'r'))
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    jdict = None
+    if ORJSON_AVAILABLE:
+        try:
+            jdict = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass # e.g. NaN/Infinity tokens written by json.dump, which orjson rejects
+    if jdict is None:
+        jdict = json.loads(raw)
     # check that it contains valid keys
-    if not np.all([key in VALID_WEARABLE_STREAMS for key in jdict.keys()]):
+    if not _VALID_WEARABLE_STREAMS_SET.issuperset(jdict.keys()):
         raise AttributeError("Invalid keys in JSON file. At least one key must be steps, heartrate, wake, light_estimate, or activity.")
     # create a df for each wearable stream
     df_dict = {}
     for key in jdict.keys():
-        if key in VALID_WEARABLE_STREAMS:
+        if key in _VALID_WEARABLE_STREAMS_SET:
             df_dict[key] = pd.DataFrame.from_dict(jdict[key])
         else:
             print(f"Excluded key: {key} because it's not a valid wearable stream column name.")
-    for key in df_dict.keys():
-        df = df_dict[key]
+    # convert the epoch columns of every stream in one pass per epoch dtype. Grouping by dtype keeps the
+    # resulting datetime unit the same as converting each column on its own (e.g. int epochs stay at second resolution)
+    epoch_columns = {} # epoch dtype -> [(stream, source column, target column)]
+    for key, df in df_dict.items():
         if 'timestamp' in df.columns:
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+            columns = [('timestamp', 'datetime')]
         elif 'start' in df.columns and 'end' in df.columns:
-            df['start'] = pd.to_datetime(df['start'], unit='s')
-            df['end'] = pd.to_datetime(df['end'], unit='s')
+            columns = [('start', 'start'), ('end', 'end')]
+        else:
+            columns = []
+        for column, target in columns:
+            epoch_columns.setdefault(df[column].dtype, []).append((key, column, target))
+    for columns in epoch_columns.values():
+        epochs = np.concatenate([df_dict[key][column].to_numpy() for key, column, _ in columns])
+        datetimes = pd.to_datetime(epochs, unit='s', cache=True)
+        offset = 0
+        for key, _, target in columns:
+            length = len(df_dict[key])
+            df_dict[key][target] = datetimes[offset:offset + length]
+            offset += length
+    for key in df_dict.keys():
+        df = df_dict[key]
         if metadata is not None:
             df.wearable.add_metadata(metadata, inplace=True)
         else:
@@ -129,13 +159,13 @@ def load_csv(filepath: str, # full path to csv file to be loaded
     df = pd.read_csv(filepath, *args, **kwargs)
     # create datetime column
     if timestamp_col is not None:
-        df['datetime'] = pd.to_datetime(df[timestamp_col], unit='s')
+        df['datetime'] = pd.to_datetime(df[timestamp_col], unit='s', cache=True)
     if timestamp_col is None:
         if 'datetime' in df.columns:
-            df['datetime'] = pd.to_datetime(df['datetime'])
+            df['datetime'] = pd.to_datetime(df['datetime'], cache=True)
         elif 'start' in df.columns and 'end' in df.columns:
-            df['start'] = pd.to_datetime(df['start'])
-            df['end'] = pd.to_datetime(df['end'])
+            df['start'] = pd.to_datetime(df['start'], cache=True)
+            df['end'] = pd.to_datetime(df['end'], cache=True)
         if 'datetime' not in df.columns and 'start' not in df.columns and 'end' not in df.columns:
             raise AttributeError("CSV file must have a column named 'datetime' or 'start' and 'end'")
     # add metadata
@@ -166,7 +196,11 @@ def load_actiwatch(filepath: str, # full path to csv file to be loaded
         WearableData._validate_metadata(metadata)
     # load csv
     df = pd.read_csv(filepath, *args, **kwargs)
-    df['datetime'] = pd.to_datetime(df['Date']+" "+df['Time'])
+    # dates and times of day repeat across rows: parse each distinct value once and add the time of day as an offset
+    dates = pd.to_datetime(df['Date'], cache=True)
+    unique_times = pd.unique(df['Time'])
+    time_offsets = pd.to_datetime("1970-01-01 " + pd.Series(unique_times)) - pd.Timestamp("1970-01-01")
+    df['datetime'] = dates + time_offsets.to_numpy()[pd.Index(unique_times).get_indexer(df['Time'])]
     # drop unnecessary columns
     df.drop(columns=['Date', 'Time'], inplace=True)
     # rename columns
@@ -179,6 +213,10 @@ def load_actiwatch(filepath: str, # full path to csv file to be loaded
     return df
 
 # %% ../nbs/api/05_readers.ipynb 14
+def _as_ns(datetimes) -> np.ndarray:
+    "Integer nanoseconds since epoch for an array of datetimes"
+    return pd.DatetimeIndex(datetimes).as_unit('ns').asi8
+
 def interval_fraction(
         starts: pd.Series, # start datetimes of intervals
         stops: pd.Series, # stop datetimes of intervals
@@ -186,29 +224,42 @@ def interval_fraction(
         ref_stop: pd.Timestamp # stop datetime of reference interval
         ):
         "Calculate the fraction of each interval contained in the reference interval."
-        max_starts = starts.apply(lambda x: max(x, ref_start))
-        min_ends = stops.apply(lambda x: min(x, ref_stop))
-        contained_intervals = (min_ends - max_starts).apply(lambda x: x.seconds)
-        full_intervals = (stops - starts).apply(lambda x: x.seconds)
-        return contained_intervals / full_intervals
+        starts_ns = _as_ns(starts)
+        stops_ns = _as_ns(stops)
+        ref_start_ns, ref_stop_ns = _as_ns([ref_start, ref_stop])
+        contained_intervals = np.minimum(stops_ns, ref_stop_ns) - np.maximum(starts_ns, ref_start_ns)
+        full_intervals = stops_ns - starts_ns
+        # zero-length intervals give NaN, as the previous pandas division did, without a RuntimeWarning
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.Series(contained_intervals / full_intervals, index=starts.index)
 
 # %% ../nbs/api/05_readers.ipynb 15
+def _expand_ranges(lo: np.ndarray, # inclusive start of each range
+                   hi: np.ndarray, # exclusive end of each range
+                   ):
+    "Enumerate every integer in each range [lo[i], hi[i]). Returns the range index and the integer for each pair"
+    counts = np.maximum(hi - lo, 0)
+    owner = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, lo[owner] + offsets
+
 def resample_df(df: pd.DataFrame, # dataframe to be resampled
                 name: str, # name of the wearable data to resample (one of steps, heartrate, wake, light_estimate, or activity)
                 freq: str, # frequency to resample to. String must be a valid pandas frequency string (e.g. '1min', '5min', '1H', '1D'). See https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
                 agg_method: str, # aggregation method to use when resampling
                 initial_datetime: pd.Timestamp = None, # initial datetime to use when resampling. If None, the minimum datetime in the dataframe is used
                 final_datetime: pd.Timestamp = None, # final datetime to use when resampling. If None, the maximum datetime in the dataframe is used
+                validate: bool = True, # whether to validate `df` as a wearable dataframe. Set to False if it was already validated
                 ) -> pd.DataFrame: # resampled dataframe
     "Resample a wearable dataframe. If data is specified in intervals, returns the density of the quantity per minute."
     # validate inputs
-    if not df.wearable.is_valid():
-        raise AttributeError("Dataframe must be a valid wearable dataframe.")
     if not isinstance(df, pd.DataFrame):
         raise AttributeError("Dataframe must be a pandas dataframe.")
+    if validate and not df.wearable.is_valid():
+        raise AttributeError("Dataframe must be a valid wearable dataframe.")
     if not isinstance(freq, str):
         raise AttributeError("Frequency must be a string.")
-    if name is not None and name not in VALID_WEARABLE_STREAMS:
+    if name is not None and name not in _VALID_WEARABLE_STREAMS_SET:
         raise AttributeError(f"Name must be one of: {VALID_WEARABLE_STREAMS}.")
     if name not in df.columns:
         raise AttributeError(f"Name must be one of: {df.columns}.")
@@ -219,7 +270,10 @@ def resample_df(df: pd.DataFrame, # dataframe to be resampled
     if final_datetime is not None and not isinstance(final_datetime, pd.Timestamp):
         raise AttributeError("Final datetime must be a pandas timestamp.")
     # resample
-    values = df[name]
+    values = df[name].to_numpy(dtype=float)
+    # parse the frequency once: the bin grid and the bin width both use it
+    step_timedelta = pd.to_timedelta(freq)
+    step = step_timedelta.as_unit('ns').value
     if 'start' in df.columns and 'end' in df.columns:
         # data is specified in intervals
         starts = df.start
@@ -228,15 +282,22 @@ def resample_df(df: pd.DataFrame, # dataframe to be resampled
             initial_datetime = starts.min()
         if final_datetime is None:
             final_datetime = stops.max()
-        new_datetime = pd.date_range(initial_datetime, final_datetime, freq=freq)
-        new_values = np.zeros(len(new_datetime))
-        for idx, datetime in enumerate(new_datetime):
-            next_datetime = datetime + pd.to_timedelta(freq)
-            mask = (starts <= next_datetime) & (stops > datetime)
-            if len(values[mask]) > 0:
-                # calculate the fraction of each interval contained in the resampled interval
-                value_fraction = interval_fraction(starts[mask], stops[mask], datetime, next_datetime)
-                new_values[idx] = (values[mask] * value_fraction).agg(agg_method)
+        new_datetime = pd.date_range(initial_datetime, final_datetime, freq=step_timedelta)
+        edges = _as_ns(new_datetime)
+        starts_ns = _as_ns(starts)
+        stops_ns = _as_ns(stops)
+        # an interval overlaps every bin with starts <= bin_start + step and stops > bin_start.
+        # bins are evenly spaced, so the first and last overlapping bin follow from integer division
+        first_edge = edges[0] if len(edges) > 0 else 0
+        lo = np.clip(-((first_edge + step - starts_ns) // step), 0, len(edges))
+        hi = np.clip(-((first_edge - stops_ns) // step), 0, len(edges))
+        interval_idx, bin_idx = _expand_ranges(lo, hi)
+        # weight each value by the fraction of its interval contained in the bin
+        contained = (np.minimum(stops_ns[interval_idx], edges[bin_idx] + step)
+                     - np.maximum(starts_ns[interval_idx], edges[bin_idx]))
+        full = stops_ns[interval_idx] - starts_ns[interval_idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bin_values = values[interval_idx] * (contained / full)
     else:
         # data is specified per datetime
         data_datetimes = df.datetime
@@ -244,13 +305,20 @@ def resample_df(df: pd.DataFrame, # dataframe to be resampled
             initial_datetime = data_datetimes.min()
         if final_datetime is None:
             final_datetime = data_datetimes.max()
-        new_datetime = pd.date_range(initial_datetime, final_datetime, freq=freq)
-        new_values = np.zeros(len(new_datetime))
-        for idx, datetime in enumerate(new_datetime):
-            next_datetime = datetime + pd.to_timedelta(freq)
-            mask = (data_datetimes <= next_datetime) & (data_datetimes >= datetime)
-            if len(values[mask]) > 0:
-                new_values[idx] = values[mask].agg(agg_method)
+        new_datetime = pd.date_range(initial_datetime, final_datetime, freq=step_timedelta)
+        edges = _as_ns(new_datetime)
+        data_ns = _as_ns(data_datetimes)
+        order = np.argsort(data_ns, kind='stable')
+        data_ns = data_ns[order]
+        # each bin includes both of its edges
+        lo = np.searchsorted(data_ns, edges, side='left')
+        hi = np.searchsorted(data_ns, edges + step, side='right')
+        bin_idx, sample_idx = _expand_ranges(lo, hi)
+        bin_values = values[order][sample_idx]
+    new_values = np.zeros(len(new_datetime))
+    if len(bin_idx) > 0:
+        aggregated = pd.Series(bin_values).groupby(bin_idx).agg(agg_method)
+        new_values[aggregated.index.to_numpy()] = aggregated.to_numpy()
 
     return pd.DataFrame({'datetime': new_datetime, name: new_values})
 
@@ -270,7 +338,7 @@ def combine_wearable_dataframes(df_dict: Dict[str, pd.DataFrame], # dictionary o
                                 ) -> pd.DataFrame: # combined wearable dataframe
     "Combine a dictionary of wearable dataframes into a single dataframe with resampling"
     df_list = []
-    # find common initial and final datetimes
+    # validate each df once and find common initial and final datetimes
     initial_datetimes = []
     final_datetimes = []
     for name in df_dict.keys():
@@ -290,14 +358,11 @@ def combine_wearable_dataframes(df_dict: Dict[str, pd.DataFrame], # dictionary o
         new_df = resample_df(df, name, resample_freq, 
                              WEARABLE_RESAMPLE_METHOD[name],
                              initial_datetime=initial_datetime,
-                             final_datetime=final_datetime)
+                             final_datetime=final_datetime,
+                             validate=False)
         df_list.append(new_df)
-    # merge all dfs by datetime
-    df = df_list[0]
-    for i in range(1, len(df_list)):
-        df = df.merge(df_list[i], on='datetime', how='outer')
-    # sort by datetime
-    df.sort_values(by='datetime', inplace=True)
+    # all dfs share the same (sorted) datetime grid, so their columns can be stacked directly
+    df = pd.concat([new_df.set_index('datetime') for new_df in df_list], axis=1).reset_index()
     # add metadata
     if metadata is not None:
         df.wearable.add_metadata(metadata, inplace=True)
@@ -29,11 +29,15 @@ class Location:
     # --- CAMPI CON GESTIONE SPECIALE ---
     processed_tile_map: List[List[Dict[str, Any]]] = field(init=False, default_factory=list)
     objects: Dict[str, GameObject] = field(default_factory=dict)
+    # Indice ausiliario degli oggetti per tipo, mantenuto da add_object/remove_object
+    objects_by_type: Dict[ObjectType, List[GameObject]] = field(init=False, default_factory=dict, repr=False)
     npcs_present_ids: Set[str] = field(default_factory=set)
     walkable_grid: List[List[bool]] = field(init=False, default_factory=list)
 
     def __post_init__(self):
         """Metodo speciale chiamato dalle dataclass dopo l'__init__."""
+        for obj in self.objects.values():
+            self.objects_by_type.setdefault(obj.object_type, []).append(obj)
         if self.tile_map:
             self._process_tile_map()
             self._create_walkability_grid()
@@ -42,11 +46,17 @@ class Location:
         """Aggiunge un oggetto alla locazione."""
         if obj.object_id not in self.objects:
             self.objects[obj.object_id] = obj
+            self.objects_by_type.setdefault(obj.object_type, []).append(obj)
 
     def remove_object(self, object_id: str):
         """Rimuove un oggetto dalla locazione."""
-        if object_id in self.objects:
-            del self.objects[object_id]
+        obj = self.objects.pop(object_id, None)
+        if obj is not None:
+            same_type = self.objects_by_type.get(obj.object_type)
+            if same_type:
+                same_type.remove(obj)
+                if not same_type:
+                    del self.objects_by_type[obj.object_type]
 
     def add_npc(self, npc_id: str):
         """Registra che un NPC è entrato nella locazione."""
@@ -71,9 +81,9 @@ class Location:
     #     """Restituisce un oggetto specifico presente nella locazione tramite il suo ID."""
     #     return next((obj for obj in self.objects_in_location if obj.object_id == object_id), None)
         
-    # def get_objects_by_type(self, object_type: ObjectType) -> List[GameObject]:
-    #     """Restituisce una lista di oggetti di un tipo specifico presenti nella locazione."""
-    #     return [obj for obj in self.objects_in_location if obj.object_type == object_type]
+    def get_objects_by_type(self, object_type: ObjectType) -> List[GameObject]:
+        """Restituisce una lista di oggetti di un tipo specifico presenti nella locazione."""
+        return list(self.objects_by_type.get(object_type, ()))
 
 
         